@@ -3219,6 +3219,7 @@ class SampleCollection(object):
         skip_failures=True,
         warn_failures=False,
         progress=None,
+        use_disk_cache=False,
     ):
         """Populates the ``metadata`` field of all samples in the collection.
 
@@ -3235,6 +3236,10 @@ class SampleCollection(object):
             progress (None): whether to render a progress bar (True/False), use
                 the default value ``fiftyone.config.show_progress_bars``
                 (None), or a progress callback function to invoke instead
+            use_disk_cache (False): whether to reuse metadata of local files
+                from previous calls, as long as the files have not been
+                modified since. Metadata is cached in
+                ``fiftyone.config.default_dataset_dir``
         """
         fomt.compute_metadata(
             self,
@@ -3243,6 +3248,7 @@ class SampleCollection(object):
             skip_failures=skip_failures,
             warn_failures=warn_failures,
             progress=progress,
+            use_disk_cache=use_disk_cache,
         )
 
     def apply_model(
@@ -5,18 +5,35 @@ Metadata stored in dataset samples.
 | `voxel51.com <https://voxel51.com/>`_
 |
 """
-from collections import defaultdict
+from collections import Counter
+import contextlib
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from functools import lru_cache
+import io
 import itertools
 import logging
-import multiprocessing.dummy
+import mimetypes
 import os
+import queue
+import sqlite3
+import struct
+import threading
+from urllib.parse import urlparse
 
+import cachetools
 import requests
+from requests.adapters import HTTPAdapter
 from PIL import Image
 
 import eta.core.utils as etau
 import eta.core.video as etav
 
+import fiftyone as fo
 import fiftyone.core.fields as fof
 import fiftyone.core.media as fom
 from fiftyone.core.odm import DynamicEmbeddedDocument
@@ -59,7 +76,7 @@ class Metadata(DynamicEmbeddedDocument):
     @classmethod
     def _build_for_local(cls, filepath, mime_type=None):
         if mime_type is None:
-            mime_type = etau.guess_mime_type(filepath)
+            mime_type = _guess_mime_type(filepath)
 
         size_bytes = os.path.getsize(filepath)
 
@@ -70,9 +87,7 @@ class Metadata(DynamicEmbeddedDocument):
         if mime_type is None:
             mime_type = etau.guess_mime_type(url)
 
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()
-            size_bytes = int(r.headers["Content-Length"])
+        size_bytes = _get_url_size_bytes(url)
 
         return cls(size_bytes=size_bytes, mime_type=mime_type)
 
@@ -114,12 +129,11 @@ class ImageMetadata(Metadata):
 
     @classmethod
     def _build_for_local(cls, path, mime_type=None):
-        size_bytes = os.path.getsize(path)
-
         if mime_type is None:
-            mime_type = etau.guess_mime_type(path)
+            mime_type = _guess_mime_type(path)
 
         with open(path, "rb") as f:
+            size_bytes = os.fstat(f.fileno()).st_size
             width, height, num_channels = get_image_info(f)
 
         return cls(
@@ -135,10 +149,9 @@ class ImageMetadata(Metadata):
         if mime_type is None:
             mime_type = etau.guess_mime_type(url)
 
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()
-            size_bytes = int(r.headers["Content-Length"])
-            width, height, num_channels = get_image_info(fou.ResponseStream(r))
+        size_bytes, (width, height, num_channels) = _get_url_image_info(
+            url, mime_type=mime_type
+        )
 
         return cls(
             size_bytes=size_bytes,
@@ -250,7 +263,7 @@ class SceneMetadata(Metadata):
     @classmethod
     def _build_for_local(cls, scene_path, mime_type=None, cache=None):
         if mime_type is None:
-            mime_type = "application/octet-stream"
+            mime_type = _SCENE_MIME_TYPE
 
         scene_size = os.path.getsize(scene_path)
         scene = fo3d.Scene.from_fo3d(scene_path)
@@ -273,18 +286,36 @@ class SceneMetadata(Metadata):
         raise ValueError("Scene URLs are not currently supported")
 
 
+_SCENE_MIME_TYPE = "application/octet-stream"
+
+
+def _guess_mime_type(filepath):
+    # MIME types only depend on the file extension, so cache them per
+    # extension. Compound extensions like `.tar.gz` are not cached
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext in mimetypes.encodings_map or ext in mimetypes.suffix_map:
+        return etau.guess_mime_type(filepath)
+
+    return _guess_mime_type_for_ext(ext)
+
+
+@lru_cache(maxsize=256)
+def _guess_mime_type_for_ext(ext):
+    return etau.guess_mime_type("file" + ext)
+
+
 def _parse_assets(scene, scene_path, cache=None):
     asset_paths = scene.get_asset_paths()
 
-    asset_counts = defaultdict(int)
     scene_dir = os.path.dirname(scene_path)
     for i, asset_path in enumerate(asset_paths):
         if not fos.isabs(asset_path):
-            asset_path = fos.abspath(fos.join(scene_dir, asset_path))
-            asset_paths[i] = asset_path
+            asset_paths[i] = fos.abspath(fos.join(scene_dir, asset_path))
+
+    # Different relative paths may refer to the same asset
+    asset_paths = set(asset_paths)
 
-        file_type = os.path.splitext(asset_path)[1][1:]
-        asset_counts[file_type] += 1
+    asset_counts = Counter(os.path.splitext(p)[1][1:] for p in asset_paths)
 
     asset_size = 0
 
@@ -296,24 +327,23 @@ def _parse_assets(scene, scene_path, cache=None):
                 asset_size += metadata.size_bytes
                 continue
 
-        tasks.append((None, asset_path, fom.MIXED, cache))
+        # Key results by asset path so they can be consumed directly
+        tasks.append((asset_path, asset_path, fom.MIXED, cache, None))
 
-    results = []
     if len(tasks) <= 1:
-        for task in tasks:
-            results.append(_do_compute_metadata(task))
+        results = map(_do_compute_metadata, tasks)
     else:
-        num_workers = fou.recommend_thread_pool_workers(min(len(tasks), 8))
-        with multiprocessing.dummy.Pool(processes=num_workers) as pool:
-            results.extend(pool.imap(_do_compute_metadata, tasks))
+        # Consume assets as they complete so that one slow asset does not
+        # hold up the others
+        executor = _get_asset_executor()
+        futures = [executor.submit(_do_compute_metadata, t) for t in tasks]
+        results = (f.result() for f in as_completed(futures))
 
-    for task, result in zip(tasks, results):
-        metadata = result[1]
+    for asset_path, metadata in results:
         asset_size += metadata.size_bytes
 
         if cache is not None:
-            scene_path = task[1]
-            cache[scene_path] = metadata
+            cache[asset_path] = metadata
 
     return dict(asset_counts), asset_size
 
@@ -337,6 +367,46 @@ def compute_sample_metadata(sample, overwrite=False, skip_failures=False):
         sample.save()
 
 
+def compute_sample_metadata_batch(
+    samples, overwrite=False, skip_failures=False, batch_size=None
+):
+    """Populates the ``metadata`` field of the given samples.
+
+    Unlike calling :func:`compute_sample_metadata` on each sample, samples
+    that belong to datasets are saved in batches rather than individually.
+
+    Args:
+        samples: an iterable of :class:`fiftyone.core.sample.Sample` or
+            :class:`fiftyone.core.sample.SampleView` instances
+        overwrite (False): whether to overwrite existing metadata
+        skip_failures (False): whether to gracefully continue without raising
+            an error if metadata cannot be computed
+        batch_size (None): the batch size to use when saving samples. See
+            :class:`fiftyone.core.collections.SaveContext` for details
+    """
+    contexts = {}
+    with contextlib.ExitStack() as stack:
+        for sample in samples:
+            if not overwrite and sample.metadata is not None:
+                continue
+
+            sample.metadata = _compute_sample_metadata(
+                sample.filepath, sample.media_type, skip_failures=skip_failures
+            )
+            if not sample._in_db:
+                continue
+
+            sample_collection = sample._collection
+            ctx = contexts.get(id(sample_collection), None)
+            if ctx is None:
+                ctx = stack.enter_context(
+                    sample_collection.save_context(batch_size=batch_size)
+                )
+                contexts[id(sample_collection)] = ctx
+
+            ctx.save(sample)
+
+
 def get_metadata_cls(media_type):
     """Get the ``metadata`` class for a media_type
 
@@ -363,6 +433,7 @@ def compute_metadata(
     skip_failures=True,
     warn_failures=False,
     progress=None,
+    use_disk_cache=False,
 ):
     """Populates the ``metadata`` field of all samples in the collection.
 
@@ -381,6 +452,9 @@ def compute_metadata(
         progress (None): whether to render a progress bar (True/False), use the
             default value ``fiftyone.config.show_progress_bars`` (None), or a
             progress callback function to invoke instead
+        use_disk_cache (False): whether to reuse metadata of local files from
+            previous calls, as long as the files have not been modified since.
+            Metadata is cached in ``fiftyone.config.default_dataset_dir``
     """
     num_workers = fou.recommend_thread_pool_workers(num_workers)
 
@@ -390,21 +464,24 @@ def compute_metadata(
         )
 
     if num_workers <= 1:
-        _compute_metadata(
-            sample_collection, overwrite=overwrite, progress=progress
+        num_missing = _compute_metadata(
+            sample_collection,
+            overwrite=overwrite,
+            progress=progress,
+            use_disk_cache=use_disk_cache,
         )
     else:
-        _compute_metadata_multi(
+        num_missing = _compute_metadata_multi(
             sample_collection,
             num_workers,
             overwrite=overwrite,
             progress=progress,
+            use_disk_cache=use_disk_cache,
         )
 
     if skip_failures and not warn_failures:
         return
 
-    num_missing = len(sample_collection.exists("metadata", False))
     if num_missing > 0:
         msg = (
             "Failed to populate metadata on %d samples. "
@@ -417,6 +494,16 @@ def compute_metadata(
             raise ValueError(msg)
 
 
+# Value from PIL.ExifTags.Base.Orientation == 274
+#   We hard-code the value directly here so we can support older Pillow
+#   versions that don't have ExifTags.Base.
+#   It's ok because this value will never change.
+_EXIF_ORIENTATION_TAG = 0x0112
+
+# 5, 6, 7, 8 --> TRANSPOSE, ROTATE_270, TRANSVERSE, ROTATE_90
+_FLIPPED_ORIENTATIONS = frozenset({5, 6, 7, 8})
+
+
 def _image_has_flipped_dimensions(img):
     """Returns True if image has flipped width/height dimensions
 
@@ -435,15 +522,23 @@ def _image_has_flipped_dimensions(img):
     Returns:
         True if image width/height should be flipped
     """
-    # Value from PIL.ExifTags.Base.Orientation == 274
-    #   We hard-code the value directly here so we can support older Pillow
-    #   versions that don't have ExifTags.Base.
-    #   It's ok because this value will never change.
-    orientation_tag = 0x0112
-    exif_orientation = img.getexif().get(orientation_tag)
-    # 5, 6, 7, 8 --> TRANSPOSE, ROTATE_270, TRANSVERSE, ROTATE_90
-    is_rotated = exif_orientation in {5, 6, 7, 8}
-    return is_rotated
+    # Reading the one tag we need from the raw EXIF data is much cheaper than
+    # having PIL parse all of it
+    exif_orientation = None
+    exif = img.info.get("exif", None)
+    if isinstance(exif, bytes):
+        if exif.startswith(b"Exif\x00\x00"):
+            exif = exif[6:]
+
+        try:
+            exif_orientation = _read_exif_orientation(exif)
+        except Exception:
+            pass
+
+    if exif_orientation is None:
+        exif_orientation = img.getexif().get(_EXIF_ORIENTATION_TAG)
+
+    return exif_orientation in _FLIPPED_ORIENTATIONS
 
 
 def get_image_info(f):
@@ -456,6 +551,11 @@ def get_image_info(f):
     Returns:
         ``(width, height, num_channels)``
     """
+    image_info = _read_image_header(f)
+    if image_info is not None:
+        return image_info
+
+    f.seek(0)
     img = Image.open(f)
 
     # Flip the dimensions if image metadata requires us to. PIL.Image doesn't
@@ -468,8 +568,214 @@ def get_image_info(f):
     return width, height, len(img.getbands())
 
 
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_NUM_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+_PNG_TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+_PNG_XMP_KEYWORD = b"XML:com.adobe.xmp\x00"
+_PNG_RAW_EXIF_KEYWORD = b"Raw profile type exif\x00"
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_JPEG_XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+_BMP_HEADER_SIZES = (12, 40, 52, 56, 64, 108, 124)
+
+
+def _read_image_header(f):
+    # Parses the dimensions and number of channels of common formats directly
+    # from their headers, which is much cheaper than having PIL initialize a
+    # decoder (PNGs are fully decoded by PIL just to check their EXIF data).
+    # Returns None whenever the result might not match PIL's, in which case
+    # the caller should fall back to PIL
+    try:
+        header = f.read(64)
+        if header.startswith(b"\xff\xd8"):
+            return _read_jpeg_header(f)
+
+        if header.startswith(_PNG_SIGNATURE):
+            return _read_png_header(f, header)
+
+        if header.startswith(b"BM"):
+            return _read_bmp_header(header)
+
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return _read_webp_header(header)
+    except Exception:
+        pass
+
+    return None
+
+
+def _read_jpeg_header(f):
+    size = None
+    exif = None
+    has_xmp = False
+
+    # Walk the markers up to the start of scan, which is where PIL stops
+    f.seek(2)
+    while True:
+        if f.read(1) != b"\xff":
+            return None
+
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+
+        if not marker:
+            return None
+
+        marker = marker[0]
+        if marker in (0xD9, 0xDA):
+            break
+
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+
+        length = struct.unpack(">H", f.read(2))[0] - 2
+        if marker in _JPEG_SOF_MARKERS:
+            if size is not None:
+                return None
+
+            height, width, num_channels = struct.unpack(">xHHB", f.read(6))
+            size = (width, height, num_channels)
+            f.seek(length - 6, io.SEEK_CUR)
+        elif marker == 0xE1:
+            data = f.read(length)
+            if data.startswith(b"Exif\x00\x00"):
+                if exif is None:
+                    exif = data[6:]
+            elif data.startswith(_JPEG_XMP_HEADER):
+                has_xmp = True
+        else:
+            f.seek(length, io.SEEK_CUR)
+
+    if size is None or size[2] not in (1, 3, 4):
+        return None
+
+    orientation = _read_exif_orientation(exif) if exif else None
+    if orientation is None and has_xmp:
+        # PIL may read the orientation from XMP data instead
+        return None
+
+    width, height, num_channels = size
+    if orientation in _FLIPPED_ORIENTATIONS:
+        width, height = height, width
+
+    return width, height, num_channels
+
+
+def _read_exif_orientation(data):
+    # Reads the orientation tag from the first IFD of the given TIFF data
+    byte_order = {b"II": "<", b"MM": ">"}[data[:2]]
+    offset = struct.unpack_from(byte_order + "I", data, 4)[0]
+    num_entries = struct.unpack_from(byte_order + "H", data, offset)[0]
+    for i in range(num_entries):
+        entry_offset = offset + 2 + 12 * i
+        tag, field_type = struct.unpack_from(
+            byte_order + "HH", data, entry_offset
+        )
+        if tag == _EXIF_ORIENTATION_TAG:
+            if field_type != 3:
+                raise ValueError("Unexpected orientation type %d" % field_type)
+
+            value_offset = entry_offset + 8
+            return struct.unpack_from(byte_order + "H", data, value_offset)[0]
+
+    return None
+
+
+def _read_png_header(f, header):
+    if header[12:16] != b"IHDR":
+        return None
+
+    width, height, color_type = struct.unpack(">IIxB", header[16:26])
+    num_channels = _PNG_NUM_CHANNELS.get(color_type, None)
+    if num_channels is None:
+        return None
+
+    # PIL reads orientation from eXIf chunks and from XMP and raw EXIF
+    # profile text chunks, which may appear anywhere in the file, so defer to
+    # PIL if there are any
+    f.seek(33)
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+
+        length, chunk_type = struct.unpack(">I4s", chunk)
+        if chunk_type == b"IEND":
+            break
+
+        if chunk_type == b"eXIf":
+            return None
+
+        if chunk_type in _PNG_TEXT_CHUNKS:
+            data = f.read(length)
+            if data.startswith((_PNG_XMP_KEYWORD, _PNG_RAW_EXIF_KEYWORD)):
+                return None
+
+            f.seek(4, io.SEEK_CUR)
+        else:
+            f.seek(length + 4, io.SEEK_CUR)
+
+    return width, height, num_channels
+
+
+def _read_bmp_header(header):
+    header_size = struct.unpack_from("<I", header, 14)[0]
+    if header_size not in _BMP_HEADER_SIZES:
+        return None
+
+    if header_size == 12:
+        width, height, bits = struct.unpack_from("<HHxxH", header, 18)
+        compression = 0
+    else:
+        width, height, bits, compression = struct.unpack_from(
+            "<iixxHI", header, 18
+        )
+
+    # Higher bit depths may or may not have an alpha channel
+    if bits not in (1, 4, 8, 24) or compression not in (0, 1, 2):
+        return None
+
+    return width, abs(height), 1 if bits < 24 else 3
+
+
+def _read_webp_header(header):
+    chunk_type = header[12:16]
+    if chunk_type == b"VP8 ":
+        if header[23:26] != b"\x9d\x01\x2a":
+            return None
+
+        width, height = struct.unpack_from("<HH", header, 26)
+        return width & 0x3FFF, height & 0x3FFF, 3
+
+    if chunk_type == b"VP8L":
+        if header[20] != 0x2F:
+            return None
+
+        bits = struct.unpack_from("<I", header, 21)[0]
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+        has_alpha = (bits >> 28) & 1
+        return width, height, 4 if has_alpha else 3
+
+    if chunk_type == b"VP8X":
+        # Defer animations and images with EXIF or XMP data to PIL
+        flags = header[20]
+        if flags & 0x0E:
+            return None
+
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return width, height, 4 if flags & 0x10 else 3
+
+    return None
+
+
 def _compute_metadata(
-    sample_collection, overwrite=False, batch_size=1000, progress=None
+    sample_collection,
+    overwrite=False,
+    batch_size=1000,
+    progress=None,
+    use_disk_cache=False,
 ):
     if not overwrite:
         sample_collection = sample_collection.exists("metadata", False)
@@ -481,26 +787,35 @@ def _compute_metadata(
 
     num_samples = len(ids)
     if num_samples == 0:
-        return
+        return 0
 
     logger.info("Computing metadata...")
 
-    cache = {}
-    values = {}
-    inputs = zip(ids, filepaths, media_types, itertools.repeat(cache))
+    cache = _MetadataCache(_CACHE_SIZE)
+    disk_cache = _open_disk_cache() if use_disk_cache else None
+    num_failures = 0
+    inputs = zip(
+        ids,
+        filepaths,
+        media_types,
+        itertools.repeat(cache),
+        itertools.repeat(disk_cache),
+    )
 
     try:
-        with fou.ProgressBar(total=num_samples, progress=progress) as pb:
-            for args in pb(inputs):
-                sample_id, metadata = _do_compute_metadata(args)
-                values[sample_id] = metadata
-                if len(values) >= batch_size:
-                    sample_collection.set_values(
-                        "metadata", values, key_field="id"
-                    )
-                    values.clear()
+        with _MetadataWriter(sample_collection, batch_size) as writer:
+            with fou.ProgressBar(total=num_samples, progress=progress) as pb:
+                for args in pb(inputs):
+                    sample_id, metadata = _do_compute_metadata(args)
+                    if metadata is None:
+                        num_failures += 1
+
+                    writer.add(sample_id, metadata)
     finally:
-        sample_collection.set_values("metadata", values, key_field="id")
+        if disk_cache is not None:
+            disk_cache.close()
+
+    return num_failures
 
 
 def _compute_metadata_multi(
@@ -509,6 +824,7 @@ def _compute_metadata_multi(
     overwrite=False,
     batch_size=1000,
     progress=None,
+    use_disk_cache=False,
 ):
     if not overwrite:
         sample_collection = sample_collection.exists("metadata", False)
@@ -520,56 +836,351 @@ def _compute_metadata_multi(
 
     num_samples = len(ids)
     if num_samples == 0:
-        return
+        return 0
 
     logger.info("Computing metadata...")
 
-    cache = {}
-    values = {}
-    inputs = zip(ids, filepaths, media_types, itertools.repeat(cache))
+    cache = _MetadataCache(_CACHE_SIZE)
+    disk_cache = _open_disk_cache() if use_disk_cache else None
+    num_failures = 0
+    inputs = zip(
+        ids,
+        filepaths,
+        media_types,
+        itertools.repeat(cache),
+        itertools.repeat(disk_cache),
+    )
+
+    executor = _get_executor(num_workers)
+    results = _map_unordered(
+        executor, _do_compute_metadata, inputs, 4 * num_workers
+    )
 
     try:
-        with multiprocessing.dummy.Pool(processes=num_workers) as pool:
+        with _MetadataWriter(sample_collection, batch_size) as writer:
             with fou.ProgressBar(total=num_samples, progress=progress) as pb:
-                for sample_id, metadata in pb(
-                    pool.imap_unordered(_do_compute_metadata, inputs)
-                ):
-                    values[sample_id] = metadata
-                    if len(values) >= batch_size:
-                        sample_collection.set_values(
-                            "metadata", values, key_field="id"
-                        )
-                        values.clear()
+                for sample_id, metadata in pb(results):
+                    if metadata is None:
+                        num_failures += 1
+
+                    writer.add(sample_id, metadata)
     finally:
-        sample_collection.set_values("metadata", values, key_field="id")
+        results.close()
+
+        if disk_cache is not None:
+            disk_cache.close()
+
+    return num_failures
+
+
+class _MetadataWriter(object):
+    # Saves metadata in batches from a background thread, so that database
+    # writes overlap with computing the next batch
+
+    def __init__(self, sample_collection, batch_size, max_pending=2):
+        self._sample_collection = sample_collection
+        self._batch_size = batch_size
+        self._values = {}
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._error = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        # Any remaining metadata is saved even if an error occurred
+        if self._values:
+            self._queue.put(self._values)
+
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._error is not None and args[0] is None:
+            raise self._error
+
+    def add(self, sample_id, metadata):
+        if self._error is not None:
+            raise self._error
+
+        self._values[sample_id] = metadata
+        if len(self._values) >= self._batch_size:
+            self._queue.put(self._values)
+            self._values = {}
+
+    def _run(self):
+        while True:
+            values = self._queue.get()
+            if values is None:
+                break
+
+            if self._error is not None:
+                continue
+
+            try:
+                self._sample_collection.set_values(
+                    "metadata", values, key_field="id"
+                )
+            except Exception as e:
+                self._error = e
+
+
+# Maximum number of scene asset metadata to cache per compute_metadata() call
+_CACHE_SIZE = 50000
+
+
+class _MetadataCache(cachetools.LRUCache):
+    # An LRU cache that is safe to share between metadata worker threads
+
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return super().get(key, default)
+
+
+class _DiskCache(object):
+    # Persists the metadata of local files across compute_metadata() calls.
+    # Entries are only valid while the file's size and modification time are
+    # unchanged. Caching is best effort, so errors reading or writing entries
+    # are logged rather than raised
+
+    def __init__(self):
+        path = os.path.join(
+            fo.config.default_dataset_dir, "__metadata__", "metadata.db"
+        )
+        fos.ensure_basedir(path)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        try:
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS metadata ("
+                    "filepath TEXT, "
+                    "media_type TEXT, "
+                    "mtime_ns INTEGER, "
+                    "size INTEGER, "
+                    "metadata TEXT, "
+                    "PRIMARY KEY (filepath, media_type))"
+                )
+        except:
+            self._conn.close()
+            raise
+
+    def get_metadata(self, filepath, media_type):
+        stat = os.stat(filepath)
+        key = (filepath, media_type, stat.st_mtime_ns, stat.st_size)
+
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT metadata FROM metadata "
+                    "WHERE filepath = ? AND media_type = ? "
+                    "AND mtime_ns = ? AND size = ?",
+                    key,
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug("Failed to read metadata cache: %s", e)
+            row = None
+
+        if row is not None:
+            try:
+                return Metadata.from_json(row[0])
+            except Exception as e:
+                logger.debug("Failed to decode cached metadata: %s", e)
+
+        metadata = _build_metadata(filepath, media_type)
+
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?)",
+                    key + (metadata.to_json(),),
+                )
+        except sqlite3.Error as e:
+            logger.debug("Failed to write metadata cache: %s", e)
+
+        return metadata
+
+    def close(self):
+        self._conn.close()
+
+
+def _open_disk_cache():
+    try:
+        return _DiskCache()
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(
+            "Failed to open metadata cache; proceeding without it: %s", e
+        )
+        return None
+
+
+# Thread pools are kept alive across calls so that repeated metadata
+# computations don't pay for spawning and joining worker threads each time.
+# Scene assets use their own pool because they are computed from within
+# sample workers, which could otherwise deadlock waiting on their own pool
+_executor = None
+_executor_num_workers = None
+_asset_executor = None
+_executors_lock = threading.Lock()
+
+
+def _get_executor(num_workers):
+    global _executor
+    global _executor_num_workers
+
+    # Only one sample pool is kept. When a different size is requested, the
+    # old pool is released rather than shut down, since another call may
+    # still be using it. Its threads exit once it is garbage collected
+    with _executors_lock:
+        if _executor is None or _executor_num_workers != num_workers:
+            _executor = ThreadPoolExecutor(max_workers=num_workers)
+            _executor_num_workers = num_workers
+
+    return _executor
+
+
+def _get_asset_executor():
+    global _asset_executor
+
+    with _executors_lock:
+        if _asset_executor is None:
+            num_workers = fou.recommend_thread_pool_workers(8)
+            _asset_executor = ThreadPoolExecutor(max_workers=num_workers)
+
+    return _asset_executor
+
+
+# A shared session lets URL metadata requests reuse pooled connections
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session():
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_maxsize=64, pool_block=False)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+
+    return _session
+
+
+def _reset_after_fork():
+    global _asset_executor
+    global _executor
+    global _executor_num_workers
+    global _executors_lock
+    global _session
+    global _session_lock
+
+    # Worker threads and open connections do not survive a fork, so children
+    # must start fresh. Locks are recreated too, since they may have been held
+    # by a parent thread that does not exist in the child
+    _executor = None
+    _executor_num_workers = None
+    _asset_executor = None
+    _executors_lock = threading.Lock()
+    _session = None
+    _session_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _map_unordered(executor, fcn, tasks, max_pending):
+    # Like `executor.map()`, but yields results in completion order and only
+    # keeps `max_pending` tasks in flight, so large inputs are not submitted
+    # all at once
+    tasks = iter(tasks)
+    pending = {
+        executor.submit(fcn, task)
+        for task in itertools.islice(tasks, max_pending)
+    }
+
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for task in itertools.islice(tasks, len(done)):
+                pending.add(executor.submit(fcn, task))
+
+            for future in done:
+                yield future.result()
+    finally:
+        # The executor is shared, so don't leave queued tasks behind if the
+        # consumer stops early
+        for future in pending:
+            future.cancel()
 
 
 def _do_compute_metadata(args):
-    sample_id, filepath, media_type, cache = args
+    sample_id, filepath, media_type, cache, disk_cache = args
     metadata = _compute_sample_metadata(
-        filepath, media_type, skip_failures=True, cache=cache
+        filepath,
+        media_type,
+        skip_failures=True,
+        cache=cache,
+        disk_cache=disk_cache,
     )
     return sample_id, metadata
 
 
 def _compute_sample_metadata(
-    filepath, media_type, skip_failures=False, cache=None
+    filepath, media_type, skip_failures=False, cache=None, disk_cache=None
 ):
     if not skip_failures:
-        return _get_metadata(filepath, media_type, cache=cache)
+        return _get_metadata(
+            filepath, media_type, cache=cache, disk_cache=disk_cache
+        )
 
     try:
-        return _get_metadata(filepath, media_type, cache=cache)
+        return _get_metadata(
+            filepath, media_type, cache=cache, disk_cache=disk_cache
+        )
     except:
         return None
 
 
-def _get_metadata(filepath, media_type, cache=None):
+def _get_metadata(filepath, media_type, cache=None, disk_cache=None):
     if cache is not None:
         metadata = cache.get(filepath, None)
         if metadata is not None:
             return metadata
 
+    # Scene metadata also depends on the scene's assets, so it cannot be
+    # validated against the scene file alone
+    if (
+        disk_cache is not None
+        and media_type != fom.THREE_D
+        and not filepath.startswith("http")
+    ):
+        return disk_cache.get_metadata(filepath, media_type)
+
+    return _build_metadata(filepath, media_type, cache=cache)
+
+
+def _build_metadata(filepath, media_type, cache=None):
     if media_type == fom.IMAGE:
         metadata = ImageMetadata.build_for(filepath)
     elif media_type == fom.VIDEO:
@@ -580,3 +1191,85 @@ def _get_metadata(filepath, media_type, cache=None):
         metadata = Metadata.build_for(filepath)
 
     return metadata
+
+
+# Hosts whose URLs need a GET request to retrieve their size. For example,
+# presigned URLs are typically only signed for GET
+_no_head_hosts = set()
+
+
+def _get_url_size_bytes(url):
+    # Try a HEAD request first so that no body transfer is initiated. Some
+    # servers reject HEAD or omit Content-Length, so fall back to a GET and
+    # skip HEAD for that host from then on
+    host = urlparse(url).netloc
+    if host not in _no_head_hosts:
+        with _get_session().head(url, allow_redirects=True) as r:
+            if r.ok and "Content-Length" in r.headers:
+                return int(r.headers["Content-Length"])
+
+    with _get_session().get(url, stream=True) as r:
+        r.raise_for_status()
+        size_bytes = int(r.headers["Content-Length"])
+
+    _no_head_hosts.add(host)
+
+    return size_bytes
+
+
+# Byte ranges to request, in order, when reading image headers from URLs
+_IMAGE_HEADER_RANGES = (65536, 262144)
+
+
+def _get_url_image_info(url, mime_type=None):
+    # Image headers almost always live in the first few KB of the file, so
+    # try ranged requests before resorting to streaming the whole image.
+    # PNG orientation may be stored anywhere in the file, so PNGs are always
+    # streamed
+    if mime_type == "image/png":
+        header_ranges = ()
+    else:
+        header_ranges = _IMAGE_HEADER_RANGES
+
+    for num_bytes in header_ranges:
+        headers = {"Range": "bytes=0-%d" % (num_bytes - 1)}
+        with _get_session().get(url, headers=headers, stream=True) as r:
+            r.raise_for_status()
+
+            if r.status_code != 206:
+                # Server does not support ranges, so use the full response
+                size_bytes = int(r.headers["Content-Length"])
+                return size_bytes, get_image_info(fou.ResponseStream(r))
+
+            size_bytes = _parse_content_range_size(r.headers)
+            content = r.content
+
+        try:
+            image_info = get_image_info(io.BytesIO(content))
+        except Exception:
+            if len(content) < num_bytes:
+                # We already have the entire file
+                raise
+
+            if content.startswith(_PNG_SIGNATURE):
+                # PNG orientation may be stored anywhere in the file, so a
+                # larger range won't help
+                break
+
+            continue
+
+        if size_bytes is None:
+            size_bytes = _get_url_size_bytes(url)
+
+        return size_bytes, image_info
+
+    with _get_session().get(url, stream=True) as r:
+        r.raise_for_status()
+        size_bytes = int(r.headers["Content-Length"])
+        return size_bytes, get_image_info(fou.ResponseStream(r))
+
+
+def _parse_content_range_size(headers):
+    # Content-Range: bytes <start>-<end>/<size>, where <size> may be "*"
+    size = headers.get("Content-Range", "").rpartition("/")[2]
+    return int(size) if size.isdigit() else None
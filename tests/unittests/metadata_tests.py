@@ -5,14 +5,307 @@ FiftyOne metadata unit tests.
 | `voxel51.com <https://voxel51.com/>`_
 |
 """
+from concurrent.futures import ThreadPoolExecutor
+import io
 import json
 import os
+import sqlite3
 import tempfile
+import threading
 import unittest
+from unittest.mock import MagicMock, patch
 
+from PIL import Image, PngImagePlugin
+
+import fiftyone as fo
+import fiftyone.core.media as fomm
 import fiftyone.core.metadata as fom
 import fiftyone.core.threed as fo3d
 
+from decorators import drop_datasets
+
+
+class ImageMetadataTests(unittest.TestCase):
+    def test_get_image_info(self):
+        formats = [
+            ("PNG", "L", 1),
+            ("PNG", "LA", 2),
+            ("PNG", "RGB", 3),
+            ("PNG", "RGBA", 4),
+            ("PNG", "P", 1),
+            ("JPEG", "L", 1),
+            ("JPEG", "RGB", 3),
+            ("JPEG", "CMYK", 4),
+            ("BMP", "P", 1),
+            ("BMP", "RGB", 3),
+            ("WEBP", "RGB", 3),
+            ("WEBP", "RGBA", 4),
+            ("GIF", "P", 1),
+        ]
+
+        for fmt, mode, num_channels in formats:
+            f = io.BytesIO()
+            Image.new(mode, (32, 24)).save(f, format=fmt)
+            f.seek(0)
+
+            self.assertEqual(
+                fom.get_image_info(f), (32, 24, num_channels), (fmt, mode)
+            )
+
+    def test_get_image_info_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+
+        for fmt in ("JPEG", "PNG"):
+            f = io.BytesIO()
+            Image.new("RGB", (32, 24)).save(f, format=fmt, exif=exif)
+            f.seek(0)
+
+            self.assertEqual(fom.get_image_info(f), (24, 32, 3), fmt)
+
+        # ImageMagick-style raw EXIF profiles stored in PNG text chunks
+        exif_bytes = exif.tobytes()
+        profile = "\nexif\n%8d\n%s\n" % (len(exif_bytes), exif_bytes.hex())
+        pnginfo = PngImagePlugin.PngInfo()
+        pnginfo.add_text("Raw profile type exif", profile)
+
+        f = io.BytesIO()
+        Image.new("RGB", (32, 24)).save(f, format="PNG", pnginfo=pnginfo)
+        f.seek(0)
+
+        self.assertEqual(fom.get_image_info(f), (24, 32, 3))
+
+
+class ComputeSampleMetadataBatchTests(unittest.TestCase):
+    @drop_datasets
+    def test_compute_sample_metadata_batch(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepaths = []
+            for i in range(4):
+                filepath = os.path.join(temp_dir, "%d.png" % i)
+                Image.new("RGB", (30 + i, 24)).save(filepath)
+                filepaths.append(filepath)
+
+            dataset = fo.Dataset()
+            dataset.add_samples(
+                [fo.Sample(filepath=filepath) for filepath in filepaths[:3]]
+            )
+
+            sample_ids = dataset.values("id")
+            sample = dataset[sample_ids[1]]
+            sample.metadata = fom.ImageMetadata(width=1)
+            sample.save()
+
+            view = dataset.select(sample_ids[:2])
+
+            # Samples with existing metadata are skipped
+            fom.compute_sample_metadata_batch(view, batch_size=1)
+            self.assertListEqual(
+                dataset.values("metadata.width"), [30, 1, None]
+            )
+
+            fom.compute_sample_metadata_batch(view, overwrite=True)
+            self.assertListEqual(
+                dataset.values("metadata.width"), [30, 31, None]
+            )
+
+            # Samples not in a dataset get metadata but are not saved
+            sample = fo.Sample(filepath=filepaths[3])
+            fom.compute_sample_metadata_batch([sample, dataset.last()])
+
+            self.assertEqual(sample.metadata.width, 33)
+            self.assertFalse(sample._in_db)
+            self.assertEqual(len(dataset), 3)
+            self.assertListEqual(
+                dataset.values("metadata.width"), [30, 31, 32]
+            )
+
+
+class MetadataWriterTests(unittest.TestCase):
+    def test_batches(self):
+        sample_collection = MagicMock()
+
+        with fom._MetadataWriter(sample_collection, 3) as writer:
+            for i in range(7):
+                writer.add(str(i), i)
+
+        batches = [
+            call.args[1]
+            for call in sample_collection.set_values.call_args_list
+        ]
+        self.assertListEqual([len(b) for b in batches], [3, 3, 1])
+
+        values = {}
+        for batch in batches:
+            values.update(batch)
+
+        self.assertDictEqual(values, {str(i): i for i in range(7)})
+
+    def test_flush_on_error(self):
+        sample_collection = MagicMock()
+
+        with self.assertRaises(RuntimeError):
+            with fom._MetadataWriter(sample_collection, 3) as writer:
+                writer.add("a", 1)
+                writer.add("b", 2)
+                raise RuntimeError()
+
+        sample_collection.set_values.assert_called_once_with(
+            "metadata", {"a": 1, "b": 2}, key_field="id"
+        )
+
+    def test_write_error(self):
+        sample_collection = MagicMock()
+        sample_collection.set_values.side_effect = ValueError()
+
+        # Errors are raised when adding values after a write has failed
+        with self.assertRaises(ValueError):
+            with fom._MetadataWriter(sample_collection, 1) as writer:
+                for i in range(5):
+                    writer.add(str(i), i)
+
+        # No more batches are written after a failure
+        sample_collection.set_values.assert_called_once()
+
+        # Errors while flushing remaining values are raised on exit
+        sample_collection.reset_mock()
+        with self.assertRaises(ValueError):
+            with fom._MetadataWriter(sample_collection, 3) as writer:
+                writer.add("a", 1)
+
+        sample_collection.set_values.assert_called_once()
+
+
+class DiskCacheTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+
+        patcher = patch.object(fo.config, "default_dataset_dir", self.temp_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_metadata(self):
+        filepath = os.path.join(self.temp_dir, "image.png")
+        Image.new("RGB", (32, 24)).save(filepath)
+
+        disk_cache = fom._DiskCache()
+        metadata = disk_cache.get_metadata(filepath, fomm.IMAGE)
+        disk_cache.close()
+
+        # Cached metadata is available to later caches
+        disk_cache = fom._DiskCache()
+        with patch.object(fom, "_build_metadata") as build_metadata:
+            cached_metadata = disk_cache.get_metadata(filepath, fomm.IMAGE)
+
+        disk_cache.close()
+
+        build_metadata.assert_not_called()
+        self.assertIsInstance(cached_metadata, fom.ImageMetadata)
+        self.assertDictEqual(cached_metadata.to_dict(), metadata.to_dict())
+
+    def test_get_metadata_media_type(self):
+        filepath = os.path.join(self.temp_dir, "image.png")
+        Image.new("RGB", (32, 24)).save(filepath)
+
+        disk_cache = fom._DiskCache()
+        metadata1 = disk_cache.get_metadata(filepath, fomm.MIXED)
+        metadata2 = disk_cache.get_metadata(filepath, fomm.IMAGE)
+        metadata3 = disk_cache.get_metadata(filepath, fomm.MIXED)
+        disk_cache.close()
+
+        self.assertIs(type(metadata1), fom.Metadata)
+        self.assertIs(type(metadata2), fom.ImageMetadata)
+        self.assertIs(type(metadata3), fom.Metadata)
+
+    def test_get_metadata_modified(self):
+        filepath = os.path.join(self.temp_dir, "image.png")
+        Image.new("RGB", (32, 24)).save(filepath)
+
+        disk_cache = fom._DiskCache()
+        disk_cache.get_metadata(filepath, fomm.IMAGE)
+
+        # Changing the size invalidates the cached metadata
+        Image.new("RGB", (40, 24)).save(filepath)
+        metadata = disk_cache.get_metadata(filepath, fomm.IMAGE)
+        self.assertEqual(metadata.width, 40)
+
+        # Changing the modification time invalidates the cached metadata
+        stat = os.stat(filepath)
+        os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with patch.object(
+            fom, "_build_metadata", wraps=fom._build_metadata
+        ) as build_metadata:
+            metadata = disk_cache.get_metadata(filepath, fomm.IMAGE)
+
+        disk_cache.close()
+
+        build_metadata.assert_called_once()
+        self.assertEqual(metadata.width, 40)
+
+    def test_get_metadata_corrupt(self):
+        filepath = os.path.join(self.temp_dir, "image.png")
+        Image.new("RGB", (32, 24)).save(filepath)
+
+        disk_cache = fom._DiskCache()
+        disk_cache.get_metadata(filepath, fomm.IMAGE)
+
+        with disk_cache._conn:
+            disk_cache._conn.execute("UPDATE metadata SET metadata = 'foo'")
+
+        # Corrupt entries are recomputed and overwritten
+        metadata = disk_cache.get_metadata(filepath, fomm.IMAGE)
+        self.assertEqual(metadata.width, 32)
+
+        with patch.object(fom, "_build_metadata") as build_metadata:
+            metadata = disk_cache.get_metadata(filepath, fomm.IMAGE)
+
+        disk_cache.close()
+
+        build_metadata.assert_not_called()
+        self.assertEqual(metadata.width, 32)
+
+    def test_get_metadata_bypass(self):
+        disk_cache = MagicMock()
+
+        # URLs and scenes are never cached
+        with patch.object(fom, "_build_metadata") as build_metadata:
+            fom._get_metadata(
+                "https://example.com/image.png",
+                fomm.IMAGE,
+                disk_cache=disk_cache,
+            )
+            fom._get_metadata(
+                "/path/to/scene.fo3d", fomm.THREE_D, disk_cache=disk_cache
+            )
+
+        disk_cache.get_metadata.assert_not_called()
+        self.assertEqual(build_metadata.call_count, 2)
+
+    def test_open_disk_cache_failure(self):
+        error = sqlite3.OperationalError("database is locked")
+        with patch.object(fom.sqlite3, "connect", side_effect=error):
+            self.assertIsNone(fom._open_disk_cache())
+
+    @drop_datasets
+    def test_compute_metadata(self):
+        filepath = os.path.join(self.temp_dir, "image.png")
+        Image.new("RGB", (32, 24)).save(filepath)
+
+        dataset = fo.Dataset()
+        dataset.add_sample(fo.Sample(filepath=filepath))
+
+        dataset.compute_metadata(use_disk_cache=True)
+        self.assertEqual(dataset.first().metadata.width, 32)
+
+        with patch.object(fom, "_build_metadata") as build_metadata:
+            dataset.compute_metadata(overwrite=True, use_disk_cache=True)
+
+        build_metadata.assert_not_called()
+        self.assertIsInstance(dataset.first().metadata, fom.ImageMetadata)
+        self.assertEqual(dataset.first().metadata.width, 32)
+
 
 class SceneMetadataTests(unittest.TestCase):
     def test_build_for(self):
@@ -34,6 +327,10 @@ class SceneMetadataTests(unittest.TestCase):
             # or `asset_counts`
             scene.add(fo3d.ObjMesh("blah-obj2", "obj.obj"))
 
+            # Add same file via a different relative path. This should not be
+            # counted either
+            scene.add(fo3d.StlMesh("blah-stl2", "./stl.stl"))
+
             scene.write(scene_path)
 
             metadata = fom.SceneMetadata.build_for(scene_path)
@@ -48,3 +345,127 @@ class SceneMetadataTests(unittest.TestCase):
                 metadata.asset_counts,
                 {"obj": 1, "jpeg": 1, "stl": 1, "mtl": 1},
             )
+
+
+class ComputeMetadataTests(unittest.TestCase):
+    def test_map_unordered(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = fom._map_unordered(
+                executor, lambda x: x**2, range(10), 3
+            )
+            self.assertListEqual(sorted(results), [x**2 for x in range(10)])
+
+    def test_map_unordered_early_exit(self):
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def fcn(x):
+            calls.append(x)
+            if x > 0:
+                started.set()
+                release.wait()
+
+            return x
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            results = fom._map_unordered(executor, fcn, range(10), 4)
+            self.assertEqual(next(results), 0)
+            started.wait()
+
+            # Tasks that have not started yet should be cancelled
+            results.close()
+            release.set()
+
+        self.assertListEqual(calls, [0, 1])
+
+    def test_get_url_size_bytes(self):
+        session = MagicMock()
+        head_response = session.head.return_value.__enter__.return_value
+        head_response.ok = False
+        get_response = session.get.return_value.__enter__.return_value
+        get_response.headers = {"Content-Length": "123"}
+
+        # Presigned URLs reject HEAD, so it should only be attempted once
+        url = "https://bucket.example.com/image.jpg?signature=abc"
+        with patch.object(fom, "_get_session", return_value=session):
+            with patch.object(fom, "_no_head_hosts", set()):
+                self.assertEqual(fom._get_url_size_bytes(url), 123)
+                self.assertEqual(fom._get_url_size_bytes(url), 123)
+
+        self.assertEqual(session.head.call_count, 1)
+        self.assertEqual(session.get.call_count, 2)
+
+    def test_get_url_image_info_large_png(self):
+        f = io.BytesIO()
+        img = Image.frombytes("RGB", (384, 256), os.urandom(384 * 256 * 3))
+        img.save(f, format="PNG")
+        data = f.getvalue()
+
+        self.assertGreater(len(data), max(fom._IMAGE_HEADER_RANGES))
+
+        def get(url, headers=None, stream=False):
+            r = MagicMock()
+            r.__enter__.return_value = r
+            if headers and "Range" in headers:
+                end = int(headers["Range"].rpartition("-")[2]) + 1
+                r.status_code = 206
+                r.headers = {
+                    "Content-Range": "bytes 0-%d/%d" % (end - 1, len(data))
+                }
+                r.content = data[:end]
+            else:
+                r.status_code = 200
+                r.headers = {"Content-Length": str(len(data))}
+                r.iter_content.side_effect = lambda chunk_size: (
+                    data[i : i + chunk_size]
+                    for i in range(0, len(data), chunk_size)
+                )
+
+            return r
+
+        session = MagicMock()
+        session.get.side_effect = get
+
+        # Known PNGs are streamed without trying ranged requests
+        url = "https://example.com/image.png"
+        with patch.object(fom, "_get_session", return_value=session):
+            size_bytes, image_info = fom._get_url_image_info(
+                url, mime_type="image/png"
+            )
+
+        self.assertEqual(size_bytes, len(data))
+        self.assertEqual(image_info, (384, 256, 3))
+        self.assertEqual(session.get.call_count, 1)
+
+        # A truncated PNG is inconclusive, so the image should be streamed
+        # after the first ranged request
+        session.get.reset_mock()
+        url = "https://example.com/image"
+        with patch.object(fom, "_get_session", return_value=session):
+            size_bytes, image_info = fom._get_url_image_info(url)
+
+        self.assertEqual(size_bytes, len(data))
+        self.assertEqual(image_info, (384, 256, 3))
+        self.assertEqual(session.get.call_count, 2)
+
+    def test_get_executor(self):
+        executor = fom._get_executor(2)
+        self.assertIs(fom._get_executor(2), executor)
+
+        # Only one pool is kept, so other sizes replace it
+        executor3 = fom._get_executor(3)
+        self.assertIsNot(executor3, executor)
+        self.assertIsNot(fom._get_executor(2), executor)
+
+    def test_reset_after_fork(self):
+        executor = fom._get_executor(2)
+
+        # Simulate a fork while another thread holds the locks
+        with fom._executors_lock, fom._session_lock:
+            fom._reset_after_fork()
+
+            self.assertIsNot(fom._get_executor(2), executor)
+            self.assertIsNotNone(fom._get_session())
+
+        executor.shutdown()